@@ -1,58 +1,309 @@
-import os
+import asyncio
+from pathlib import Path
+import aiohttp
 import numpy as np
 import pandas as pd
 import plotly.express as px
+import polars as pl
 import streamlit as st
-from geopy.geocoders import Nominatim
 from PIL import Image
 import airbnb
 
+# offline batch reverse-geocoder (KD-tree over populated places); optional,
+# the app falls back to per-row Nominatim lookups when it is missing
+try:
+    import reverse_geocoder as rg
+except ImportError:
+    rg = None
+
+# resolve data files relative to this module, not the working directory
+BASE_DIR = Path(__file__).parent
+
+NOMINATIM_REVERSE_URL = "https://nominatim.openstreetmap.org/reverse"
+
+# touristic buildings shown in the Extras tab; the bullet-point markdown is
+# built once at import instead of on every rerun
+TOURIST_LOCATIONS = ['150 KV PLANT SCIENCE PARK',
+    'A&O Amsterdam Zuidoost',
+    'Amstel Botel',
+    'BOAT & CO',
+    'Baksteen sculptuur en vijver',
+    'Bastion Hotel Amsterdam Noord',
+    'Best Western',
+    'Beurs van Berlage',
+    'Bilderberg Garden Hotel',
+    'Campanile',
+    'CitizenM',
+    'Conservatorium',
+    'Corendon City Hotel Amsterdam',
+    'Crowne Plaza Amsterdam-South',
+    'De Cornelia',
+    'De Gouden Spiegel en De Silveren Spiegel',
+    'De Hallen',
+    'De Looier',
+    'DoubleTree by Hilton Amsterdam Centraal Station',
+    'Drie-klimaten-kas',
+    'Dutch Design Hotel Artemis',
+    'Dutchies Hostel',
+    'EYE Filminstituut',
+    'Element Amsterdam',
+    'Felix Meritis',
+    'Fine Seasons',
+    'Fo Guang Sha He Hua Temple',
+    'Frederik Park House',
+    'Gemeenlandshuis',
+    'Generator',
+    'Haarlemmermeerstation',
+    'Haarlemmerpoort',
+    'Herberg Het Mandelahuisje',
+    'Het Huis met den Hoofden',
+    'Het Scheepvaartmuseum',
+    'Hilton Amsterdam',
+    'Holiday Inn',
+    'Holiday Inn Express Amsterdam - North Riverside',
+    'Hollandsche Manege',
+    'Hotel 83',
+    'Hotel Cosmos',
+    'Hotel The Exchange',
+    'House of Bols',
+    'Huis Bartolotti',
+    'Huis De Pinto',
+    'Huis aan 3 grachten',
+    'Ibis Amsterdam City West',
+    'Inntel Hotels Amsterdam Landmark',
+    'Joods Museum',
+    'Joy Hotel',
+    'Koninklijk Instituut voor de Tropen',
+    'Koninklijk Paleis',
+    'Leonardo Royal Hotel Amsterdam',
+    'Mansion',
+    'Molen van Sloten',
+    'Montelbaanstoren',
+    'Motel One',
+    'Munttoren',
+    'Museum Noord',
+    'Museum Perron Oost',
+    'NH Tropen Hotel',
+    'Nieuwzijds Kapel',
+    'OZO Hotels Arena Amsterdam',
+    'Oost-Indisch Huis',
+    'Oude Kerk',
+    'Pink Point',
+    'Pollux',
+    'Portugese Synagoge',
+    'Postillion',
+    'Room Mate Aitana Hotel',
+    'Rooms25',
+    'Scheepvaarthuis',
+    'Schreierstoren',
+    'Sint Nicolaaskerk',
+    'Sint Olofskapel',
+    'Stedelijk Museum Amsterdam',
+    'The Delphi - Amsterdam Townhouse - hotel',
+    'The Social Hub',
+    'Trippenhuis',
+    'Van Gogh Museum',
+    'Vlinderkas',
+    'Waag',
+    'Waldorf Astoria Amsterdam',
+    "Werf 't Kromhout",
+    'West-Indisch Pakhuis',
+    'WestCord Art Hotel',
+    'Westerkerk',
+    'Westertoren',
+    'Zuiderkerk',
+    'ibis Amsterdam Centre']
+TOURIST_LOCATIONS_MD = "- " + "\n- ".join(TOURIST_LOCATIONS)
+
 ################################
 # FUNCTIONS
 ################################
+@st.cache_data
+def load_filtered_listings(max_budget, max_distance):
+    # scan, filter and format the listings CSV lazily with polars
+    # (multithreaded, no pandas intermediates), converting to pandas only
+    # at the Streamlit/Plotly boundary
+    lazy = pl.scan_csv(
+        BASE_DIR / "WK1_Airbnb_Amsterdam_listings_proj_solution.csv",
+        has_header=False,
+        new_columns=[
+            "Airbnb Listing ID",
+            "Price",
+            "Latitude",
+            "Longitude",
+            "Dist.(m) from loc.",
+            "Location",
+        ],
+        # narrow dtypes halve the memory traversed downstream
+        # (the CSV stores everything as floats, so ints are cast after the scan)
+        schema_overrides=[
+            pl.Float64,
+            pl.Float32,
+            pl.Float32,
+            pl.Float32,
+            pl.Float32,
+            pl.Float32,
+        ],
+    )
+    filtered = (
+        lazy.filter(
+            (pl.col("Price") <= max_budget)
+            & (pl.col("Dist.(m) from loc.") <= max_distance)
+        )
+        .with_columns(
+            # Display as integer
+            pl.col("Airbnb Listing ID").cast(pl.Int64),
+            # Rename the number to a string, kept categorical (1 byte per row)
+            pl.col("Location")
+            .cast(pl.Int8)
+            .replace_strict({1: "To visit", 0: "Airbnb listing"})
+            .cast(pl.Categorical),
+        )
+        .collect()
+    )
+    return filtered.to_pandas(use_pyarrow_extension_array=True)
+
+@st.cache_data
+def build_map_figure(max_budget, max_distance):
+    # build the plotly figure once per filter combination; sidebar widget
+    # bounces no longer re-serialize the whole frame into a figure spec
+    dataframe = load_filtered_listings(max_budget, max_distance)
+    fig = px.scatter_mapbox(
+        dataframe,
+        lat="Latitude",
+        lon="Longitude",
+        color="Location",
+        color_discrete_sequence=["blue", "red"],
+        zoom=11,
+        height=500,
+        width=800,
+        hover_name="Price",
+        hover_data=["Dist.(m) from loc.", "Location"],
+        labels={"color": "Locations"},
+    )
+    # Price is numeric now, so format the hover title as currency on the
+    # frontend instead of showing the raw float
+    for trace in fig.data:
+        trace.hovertemplate = trace.hovertemplate.replace(
+            "<b>%{hovertext}</b>", "<b>£ %{hovertext:.2f}</b>" # <--- CHANGE THIS POUND SYMBOL IF YOU CHOSE CURRENCY OTHER THAN POUND
+        )
+    # center on the first listing; .iat is a direct scalar read, without the
+    # chained-indexing Series intermediates (and FutureWarning) of .iloc[0][n]
+    center_lat = float(dataframe["Latitude"].iat[0])
+    center_lon = float(dataframe["Longitude"].iat[0])
+    fig.update_geos(center=dict(lat=center_lat, lon=center_lon))
+    fig.update_layout(mapbox_style="stamen-terrain")
+    return fig
+
+@st.cache_resource
+def load_image(path):
+    # decode a local image once per process instead of on every rerun
+    return Image.open(path)
+
 def dataframe_with_selections(df):
-    # given a dataframe, catches user selection
-    df_with_selections = df.copy()
-    df_with_selections.insert(0, "Select", False)
+    # given a dataframe, catches user selection; concat shares the existing
+    # column buffers under copy-on-write, allocating only the new boolean
+    # Select column
+    select_col = pd.DataFrame({"Select": np.zeros(len(df), dtype=bool)}, index=df.index)
+    df_with_selections = pd.concat([select_col, df], axis=1)
 
     # Get dataframe row-selections from user with st.data_editor
     edited_df = st.data_editor(
         df_with_selections,
         hide_index=True,
-        column_config={"Select": st.column_config.CheckboxColumn(required=True)},
+        column_config={
+            "Select": st.column_config.CheckboxColumn(required=True),
+            # Price stays numeric (sortable, small Arrow payload) and is
+            # rendered as currency by the frontend
+            "Price": st.column_config.NumberColumn(format="£ %.2f"), # <--- CHANGE THIS POUND SYMBOL IF YOU CHOSE CURRENCY OTHER THAN POUND
+        },
         disabled=df.columns,
     )
 
     # Filter the dataframe using the temporary column, then drop the column
     return edited_df[edited_df.Select].drop('Select', axis=1)
 
-def getLocationDisplayNameByDF(selected_df):
-    # initialize var
-    addresses = []
-    for r in np.arange(selected_df.shape[0]):
-        # sample coords tuple = (52.509669, 13.376294)
-        coords = (selected_df['Latitude'].tolist()[r],selected_df['Longitude'].tolist()[r])
-        geolocator = Nominatim(user_agent="PP_get_location")
-        location = geolocator.reverse(coords)
-
-        listing_id = selected_df['Airbnb Listing ID'].tolist()[r]
-        rating = get_airbnb_rating(listing_id)
-        addresses.append([listing_id,"⭐" * rating,location.raw["display_name"]])
+@st.cache_resource
+def _reverse_geocode_cache():
+    # reverse-geocode results keyed by (lat, lon) rounded to ~1 m; held in a
+    # cache_resource so the dict outlives the rerun-re-executed script globals
+    # and repeat selections never re-hit the rate-limited Nominatim API
+    return {}
+
+async def _reverse_geocode(session, semaphore, lat, lon):
+    # collapse near-identical coordinates onto one cache entry
+    cache = _reverse_geocode_cache()
+    cache_key = (round(float(lat), 5), round(float(lon), 5))
+    if cache_key in cache:
+        return cache[cache_key]
+
+    # Nominatim's usage policy allows 1 request/s, so lookups are serialized
+    async with semaphore:
+        async with session.get(
+            NOMINATIM_REVERSE_URL,
+            params={"lat": float(lat), "lon": float(lon), "format": "json"},
+            headers={"User-Agent": "PP_get_location"},
+        ) as response:
+            display_name = (await response.json())["display_name"]
+
+    cache[cache_key] = display_name
+    return display_name
+
+async def _fetch_ratings(listing_ids):
+    # fetch all rating lookups concurrently in worker threads
+    return await asyncio.gather(
+        *[asyncio.to_thread(get_airbnb_rating, listing_id) for listing_id in listing_ids]
+    )
+
+async def _fetch_selection_details(coords, listing_ids):
+    # fan out all reverse-geocode and rating lookups concurrently so the
+    # wall time is bounded by the slowest call instead of the sum of all
+    semaphore = asyncio.Semaphore(1)
+    async with aiohttp.ClientSession() as session:
+        address_tasks = [_reverse_geocode(session, semaphore, lat, lon) for lat, lon in coords]
+        results = await asyncio.gather(*address_tasks, _fetch_ratings(listing_ids))
+    return results[:-1], results[-1]
+
+def _batch_reverse_geocode(coords):
+    # one in-process KD-tree batch lookup over all coords, no network at all
+    results = rg.search([(float(lat), float(lon)) for lat, lon in coords])
+    return [", ".join((res["name"], res["admin1"], res["cc"])) for res in results]
 
+def getLocationDisplayNameByDF(selected_df):
+    # materialize each column once instead of re-listing it per row;
+    # zip pairs the coords at C level, no index array or loop needed
+    # (sample coords tuple = (52.509669, 13.376294))
+    coords = list(zip(selected_df['Latitude'].to_numpy(), selected_df['Longitude'].to_numpy()))
+    listing_ids = selected_df['Airbnb Listing ID'].to_numpy().tolist()
+
+    if rg is not None:
+        display_names = _batch_reverse_geocode(coords)
+        ratings = asyncio.run(_fetch_ratings(listing_ids))
+    else:
+        display_names, ratings = asyncio.run(_fetch_selection_details(coords, listing_ids))
+    addresses = [
+        [listing_id, "⭐" * rating, display_name]
+        for listing_id, rating, display_name in zip(listing_ids, ratings, display_names)
+    ]
     return pd.DataFrame(addresses, columns=["Airbnb Listing ID","Rating","Address"])
 
+@st.cache_resource
+def _get_airbnb_api():
+    # one Api instance for the whole process (cache_resource outlives the
+    # rerun-re-executed script globals), so review lookups reuse the same
+    # keep-alive session instead of paying a TLS handshake per call
+    return airbnb.Api()
+
+@st.cache_data(ttl=3600)
 def get_airbnb_rating(listing_id,offset=0,limit_results=20):
     # clean listing_id
     listing_id = int(str(listing_id).replace(".",""))
-    # initialize Api for calls
-    api = airbnb.Api()
     # get reviews for a given AirBnb listing id
-    reviews = api.get_reviews(listing_id=listing_id,offset=offset,limit=limit_results)
-    # display all reviews ratings
-    ratings = [reviews['reviews'][r]['rating'] for r in range(len(reviews['reviews']))]
-    # get average rating
-    avg_rating = np.average(np.array(ratings)).astype(int)
-    return avg_rating
+    reviews = _get_airbnb_api().get_reviews(listing_id=listing_id,offset=offset,limit=limit_results)['reviews']
+    if not reviews:
+        return 0
+    # get average rating (plain int arithmetic, no numpy round-trip needed)
+    return sum(review['rating'] for review in reviews) // len(reviews)
 
 
 ################################
@@ -60,21 +311,6 @@ def get_airbnb_rating(listing_id,offset=0,limit_results=20):
 ################################
 
 
-# ========================================= CREATE DATAFRAME FROM CSV  =========================================
-
-# Read dataframe
-dataframe = pd.read_csv(
-    "WK1_Airbnb_Amsterdam_listings_proj_solution.csv",
-    names=[
-        "Airbnb Listing ID",
-        "Price",
-        "Latitude",
-        "Longitude",
-        "Dist.(m) from loc.",
-        "Location",
-    ],
-)
-
 # set page layout as wide
 st.set_page_config(layout="wide")
 
@@ -97,7 +333,7 @@ with st.sidebar:
     st.divider()
     st.markdown('<p class="small-font">Coding and template by Paolo Pozzoli</p>', unsafe_allow_html=True)
 
-    img_pp = Image.open(os.getcwd() + "/pp.jpg")
+    img_pp = load_image(BASE_DIR / "pp.jpg")
 
     st.image(img_pp,
             caption='Follow me on LinkedIn - https://www.linkedin.com/in/paolo-pozzoli-9bb5a183/',
@@ -129,158 +365,46 @@ with tab1_intro:
     st.write("https://www.thetimes.co.uk/travel/destinations/europe/netherlands/amsterdam/best-things-to-do-in-amsterdam")
 
 with tab2_data_analysis:
-    # split data in 2 columns of given size (column 1 = data frame, column 2 = user selected records)
-    col1_table_map, col2_selection_address = st.columns([3, 2])
-
-    with col1_table_map:
-        st.markdown("Here we can see the dataframe created during this weeks project.")
-        # filter dataframe for locations with Price equal or below max_budget
-        dataframe = dataframe[dataframe["Price"] <= max_budget]
-        # filter dataframe for locations with distance equal or below max_distance
-        dataframe = dataframe[dataframe["Dist.(m) from loc."] <= max_distance]
-
-        # Display as integer
-        dataframe["Airbnb Listing ID"] = dataframe["Airbnb Listing ID"].astype(int)
-        # Round of values
-        dataframe["Price"] = "£ " + dataframe["Price"].round(2).astype(str) # <--- CHANGE THIS POUND SYMBOL IF YOU CHOSE CURRENCY OTHER THAN POUND
-        # Rename the number to a string
-        dataframe["Location"] = dataframe["Location"].replace(
-            {1.0: "To visit", 0.0: "Airbnb listing"}
-        )
+    # filter and format the listings for the current widget values
+    dataframe = load_filtered_listings(max_budget, max_distance)
 
-        selection = dataframe_with_selections(dataframe)
+    # short-circuit the whole tab (table, map, selection) on an empty result
+    if dataframe.empty:
+        st.warning("No listings match your filters, try raising the budget or distance.")
+    else:
+        # split data in 2 columns of given size (column 1 = data frame, column 2 = user selected records)
+        col1_table_map, col2_selection_address = st.columns([3, 2])
 
-    st.markdown("Below is a map showing all the Airbnb listings with a red dot and the location we've chosen with a blue dot.")
-    # Create the plotly express figure
-    fig = px.scatter_mapbox(
-        dataframe,
-        lat="Latitude",
-        lon="Longitude",
-        color="Location",
-        color_discrete_sequence=["blue", "red"],
-        zoom=11,
-        height=500,
-        width=800,
-        hover_name="Price",
-        hover_data=["Dist.(m) from loc.", "Location"],
-        labels={"color": "Locations"},
-    )
-    fig.update_geos(center=dict(lat=dataframe.iloc[0][2], lon=dataframe.iloc[0][3]))
-    fig.update_layout(mapbox_style="stamen-terrain")
+        with col1_table_map:
+            st.markdown("Here we can see the dataframe created during this weeks project.")
+            selection = dataframe_with_selections(dataframe)
+
+        st.markdown("Below is a map showing all the Airbnb listings with a red dot and the location we've chosen with a blue dot.")
+        # Create the plotly express figure (memoized per filter combination)
+        fig = build_map_figure(max_budget, max_distance)
 
-    with col2_selection_address:
-        st.write("Your selection location:")
-        if selection.shape[0] == 0:
-            st.write("")
-        else:
-            st.write(getLocationDisplayNameByDF(selection))
+        with col2_selection_address:
+            st.write("Your selection location:")
+            if selection.shape[0] == 0:
+                st.write("")
+            else:
+                st.write(getLocationDisplayNameByDF(selection))
 
-    # Show the figure
-    st.plotly_chart(fig, use_container_width=True)
+        # Show the figure
+        st.plotly_chart(fig, use_container_width=True)
 
 
 with tab3_extras:
 
     with st.expander("Prettymaps picture of Amsterdam city"):
-        img_ams = Image.open(os.getcwd() + "/Amsterdam_Prettymaps_Macao.png")
+        img_ams = load_image(BASE_DIR / "Amsterdam_Prettymaps_Macao.png")
         st.image(img_ams)
     with st.expander("Prettymaps picture of Amsterdam city center"):
-        img_ams_center = Image.open(os.getcwd() + "/Amsterdam_Prettymaps_Tijuca.png")
+        img_ams_center = load_image(BASE_DIR / "Amsterdam_Prettymaps_Tijuca.png")
         st.image(img_ams_center)
     with st.expander("Openstreetmap picture of Amsterdam streets"):
-        img_ams_streets = Image.open(os.getcwd() + "/Amsterdam_StreetMap.png")
+        img_ams_streets = load_image(BASE_DIR / "Amsterdam_StreetMap.png")
         st.image(img_ams_streets)
 
     with st.expander("List of touristic buildings in Amsterdam"):
-        locations = ['150 KV PLANT SCIENCE PARK',
-                    'A&O Amsterdam Zuidoost',
-                    'Amstel Botel',
-                    'BOAT & CO',
-                    'Baksteen sculptuur en vijver',
-                    'Bastion Hotel Amsterdam Noord',
-                    'Best Western',
-                    'Beurs van Berlage',
-                    'Bilderberg Garden Hotel',
-                    'Campanile',
-                    'CitizenM',
-                    'Conservatorium',
-                    'Corendon City Hotel Amsterdam',
-                    'Crowne Plaza Amsterdam-South',
-                    'De Cornelia',
-                    'De Gouden Spiegel en De Silveren Spiegel',
-                    'De Hallen',
-                    'De Looier',
-                    'DoubleTree by Hilton Amsterdam Centraal Station',
-                    'Drie-klimaten-kas',
-                    'Dutch Design Hotel Artemis',
-                    'Dutchies Hostel',
-                    'EYE Filminstituut',
-                    'Element Amsterdam',
-                    'Felix Meritis',
-                    'Fine Seasons',
-                    'Fo Guang Sha He Hua Temple',
-                    'Frederik Park House',
-                    'Gemeenlandshuis',
-                    'Generator',
-                    'Haarlemmermeerstation',
-                    'Haarlemmerpoort',
-                    'Herberg Het Mandelahuisje',
-                    'Het Huis met den Hoofden',
-                    'Het Scheepvaartmuseum',
-                    'Hilton Amsterdam',
-                    'Holiday Inn',
-                    'Holiday Inn Express Amsterdam - North Riverside',
-                    'Hollandsche Manege',
-                    'Hotel 83',
-                    'Hotel Cosmos',
-                    'Hotel The Exchange',
-                    'House of Bols',
-                    'Huis Bartolotti',
-                    'Huis De Pinto',
-                    'Huis aan 3 grachten',
-                    'Ibis Amsterdam City West',
-                    'Inntel Hotels Amsterdam Landmark',
-                    'Joods Museum',
-                    'Joy Hotel',
-                    'Koninklijk Instituut voor de Tropen',
-                    'Koninklijk Paleis',
-                    'Leonardo Royal Hotel Amsterdam',
-                    'Mansion',
-                    'Molen van Sloten',
-                    'Montelbaanstoren',
-                    'Motel One',
-                    'Munttoren',
-                    'Museum Noord',
-                    'Museum Perron Oost',
-                    'NH Tropen Hotel',
-                    'Nieuwzijds Kapel',
-                    'OZO Hotels Arena Amsterdam',
-                    'Oost-Indisch Huis',
-                    'Oude Kerk',
-                    'Pink Point',
-                    'Pollux',
-                    'Portugese Synagoge',
-                    'Postillion',
-                    'Room Mate Aitana Hotel',
-                    'Rooms25',
-                    'Scheepvaarthuis',
-                    'Schreierstoren',
-                    'Sint Nicolaaskerk',
-                    'Sint Olofskapel',
-                    'Stedelijk Museum Amsterdam',
-                    'The Delphi - Amsterdam Townhouse - hotel',
-                    'The Social Hub',
-                    'Trippenhuis',
-                    'Van Gogh Museum',
-                    'Vlinderkas',
-                    'Waag',
-                    'Waldorf Astoria Amsterdam',
-                    "Werf 't Kromhout",
-                    'West-Indisch Pakhuis',
-                    'WestCord Art Hotel',
-                    'Westerkerk',
-                    'Westertoren',
-                    'Zuiderkerk',
-                    'ibis Amsterdam Centre']
-        # create bullet point from list with markdown
-        st.markdown("- " + "\n- ".join(locations))
+        st.markdown(TOURIST_LOCATIONS_MD)